@@ -49,14 +49,21 @@ with DAG(
         }
     )
 
+    # CPU-heavy work and rate-limited Drive uploads run in separate pools (created in startup.sh and docker-compose.yml)
+    # so a long upload never holds a slot the transform step needs
     transform_task = PythonOperator(
         task_id="transform_data",
-        python_callable=transform_data
+        python_callable=transform_data,
+        pool="cpu_pool"
     )
 
     load_task = PythonOperator(
         task_id="upload_to_gdrive",
-        python_callable=upload_to_gdrive
+        python_callable=upload_to_gdrive,
+        # Reuse the run date computed by transform_data instead of re-deriving it
+        op_kwargs={"today_date": "{{ ti.xcom_pull(task_ids='transform_data')['today_date'] }}"},
+        pool="drive_pool",
+        pool_slots=1
     )
 
     extract_from_s3 >> transform_task >> load_task
\ No newline at end of file
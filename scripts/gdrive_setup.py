@@ -0,0 +1,41 @@
+"""
+One-time Google Drive OAuth handshake.
+Run from the project root: python scripts/gdrive_setup.py
+Writes mycreds.txt, which GDriveUploader in src/load.py loads silently inside Airflow.
+Kept out of src/load.py so the DAG never imports the interactive auth flow.
+"""
+import os
+from pydrive2.auth import GoogleAuth
+
+
+# ==========================================
+# THE MANUAL SETUP BLOCK
+# ==========================================
+
+if __name__ == "__main__":
+    project_root = os.getcwd() 
+    secrets_path = os.path.join(project_root, 'client_secrets.json')
+    creds_path = os.path.join(project_root, 'mycreds.txt')
+
+    gauth = GoogleAuth()
+    
+    # 1. Set the client secrets path directly
+    gauth.settings['client_config_file'] = secrets_path
+    gauth.settings['client_config_backend'] = 'file'
+
+    # 2. Check for the file and run the handshake
+    if not os.path.exists(creds_path):
+        print(f"\n--- INITIAL SETUP: STARTING HANDSHAKE ---")
+        # BYPASS: Use LocalWebserverAuth if CommandLineAuth keeps looping on config
+        # If you are on your local machine, this is actually more reliable
+        try:
+            gauth.LocalWebserverAuth() 
+        except Exception:
+            # Fallback to Command Line if browser fails
+            gauth.CommandLineAuth()
+            
+        # 3. Save explicitly to the path
+        gauth.SaveCredentialsFile(creds_path)
+        print(f"\nSUCCESS: Credentials saved to {creds_path}")
+    else:
+        print(f"✅ Credentials already exist at {creds_path}.")
\ No newline at end of file
@@ -1,7 +1,63 @@
 import os
-from datetime import datetime
+import hashlib
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pydrive2.auth import GoogleAuth
-from pydrive2.drive import GoogleDrive
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload
+
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+RETRYABLE_STATUSES = {429, 500, 503}
+RATE_LIMIT_REASONS = {"userRateLimitExceeded", "rateLimitExceeded", "backendError"}
+
+
+def _is_retryable(error):
+    """True for Drive errors that are worth retrying (rate limits and transient backend failures)."""
+    status = error.resp.status
+    if status in RETRYABLE_STATUSES:
+        return True
+    if status == 403:
+        try:
+            details = json.loads(error.content.decode("utf-8"))["error"]["errors"]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return False
+        return any(d.get("reason") in RATE_LIMIT_REASONS for d in details)
+    return False
+
+
+def _retry(fn, *a, max_tries=6, base=1.0, cap=32.0, throttle=None, **kw):
+    """Calls fn, retrying rate-limited/transient Drive errors with exponential backoff and jitter.
+
+    If given, throttle() is called before every attempt so retries also respect the request rate.
+    """
+    for attempt in range(max_tries):
+        if throttle is not None:
+            throttle()
+        try:
+            return fn(*a, **kw)
+        except HttpError as e:
+            if attempt == max_tries - 1 or not _is_retryable(e):
+                raise
+            delay = min(cap, base * 2 ** attempt) + random.uniform(0, 1)
+            print(f"Drive API error ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def _file_md5(path):
+    """Hex MD5 of a local file, streamed so large files are never fully loaded."""
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):  # Python 3.11+, hashes in C without holding the GIL
+            return hashlib.file_digest(f, 'md5').hexdigest()
+        digest = hashlib.md5()
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+        return digest.hexdigest()
+
 
 class GDriveUploader:
     def __init__(self):
@@ -17,57 +73,157 @@ class GDriveUploader:
         if os.path.exists(creds_path):
             gauth.LoadCredentialsFile(creds_path)
         else:
-            raise FileNotFoundError(f"Missing 'mycreds.txt' at {creds_path}. Run this script manually first!")
+            raise FileNotFoundError(f"Missing 'mycreds.txt' at {creds_path}. Run scripts/gdrive_setup.py manually first!")
 
         if gauth.access_token_expired:
             gauth.Refresh()
         else:
             gauth.Authorize()
             
-        self.drive = GoogleDrive(gauth)
+        # GoogleAuth only loads/refreshes the token; Drive calls go through googleapiclient services
+        self.gauth = gauth
+
+        # 3. Files are uploaded concurrently; folders are still created on the calling thread
+        max_workers = int(os.getenv('GDRIVE_MAX_CONCURRENT', 4))
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._local = threading.local()
+
+        # 4. Token bucket shared by all threads to stay under Drive's ~10 writes/sec user quota
+        self._rps = float(os.getenv('GDRIVE_MAX_RPS', 8))
+        self._lock = threading.Lock()
+        self._next_ts = 0.0
+
+        # 5. parent_id -> {title: (id, mimeType, md5Checksum)}; filled once per folder, then updated in place
+        self._children_cache: dict[str, dict[str, tuple[str, str, str | None]]] = {}
+
+    def _throttle(self):
+        """Blocks until the next request slot, spacing requests at least 1/rps seconds apart."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_ts)
+            self._next_ts = slot + 1.0 / self._rps
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _call(self, fn, *a, **kw):
+        """Runs a Drive API call through the rate limiter and the retry policy."""
+        return _retry(fn, *a, throttle=self._throttle, **kw)
+
+    def _service(self):
+        """Returns a Drive v3 service owned by the current thread (httplib2 is not thread-safe)."""
+        if not hasattr(self._local, 'service'):
+            self._local.service = build('drive', 'v3', http=self.gauth.Get_Http_Object(),
+                                        cache_discovery=False)
+        return self._local.service
+
+    def _upload_one(self, local_item_path, title, parent_id, existing=None):
+        """Uploads a single file, or updates `existing` if its content changed; runs on a worker thread."""
+        if existing is not None and _file_md5(local_item_path) == existing[2]:
+            print(f"Skipping (unchanged): {title}")
+            return existing
+
+        media = MediaFileUpload(local_item_path, chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
+        if existing is not None:
+            print(f"Updating: {title}")
+            request = self._service().files().update(
+                fileId=existing[0],
+                media_body=media,
+                fields='id, mimeType, md5Checksum'
+            )
+        else:
+            print(f"Uploading: {title}")
+            request = self._service().files().create(
+                body={'name': title, 'parents': [parent_id]},
+                media_body=media,
+                fields='id, mimeType, md5Checksum'
+            )
+        # Send one chunk per call so every chunk is rate-limited and a failed chunk resumes
+        # from the last acknowledged byte instead of restarting the file
+        gfile = None
+        while gfile is None:
+            _, gfile = self._call(request.next_chunk)
+        return gfile['id'], gfile['mimeType'], gfile.get('md5Checksum')
+
+    def _list_children(self, parent_id):
+        """Returns {title: (id, mimeType, md5Checksum)} for parent_id, listing Drive only on the first request."""
+        if parent_id not in self._children_cache:
+            query = f"'{parent_id}' in parents and trashed = false"
+            children = {}
+            page_token = None
+            while True:
+                request = self._service().files().list(
+                    q=query,
+                    pageSize=1000,
+                    pageToken=page_token,
+                    fields='nextPageToken, files(id, name, mimeType, md5Checksum)'
+                )
+                response = self._call(request.execute)
+                for f in response.get('files', []):
+                    children[f['name']] = (f['id'], f['mimeType'], f.get('md5Checksum'))
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+            self._children_cache[parent_id] = children
+        return self._children_cache[parent_id]
 
     def get_or_create_folder(self, folder_name, parent_id):
-        query = (f"title = '{folder_name}' and '{parent_id}' in parents "
-                 f"and mimeType = 'application/vnd.google-apps.folder' and trashed = false")
-        file_list = self.drive.ListFile({'q': query}).GetList()
-        
-        if file_list:
-            return file_list[0]['id']
+        children = self._list_children(parent_id)
+        existing = children.get(folder_name)
+
+        if existing and existing[1] == FOLDER_MIME:
+            return existing[0]
         else:
             folder_metadata = {
-                'title': folder_name,
-                'parents': [{'id': parent_id}],
-                'mimeType': 'application/vnd.google-apps.folder'
+                'name': folder_name,
+                'parents': [parent_id],
+                'mimeType': FOLDER_MIME
             }
-            folder = self.drive.CreateFile(folder_metadata)
-            folder.Upload()
+            request = self._service().files().create(body=folder_metadata, fields='id')
+            folder = self._call(request.execute)
+            children[folder_name] = (folder['id'], FOLDER_MIME, None)
+            # A folder we just created has no children, so it never needs listing
+            self._children_cache[folder['id']] = {}
             return folder['id']
 
+    def _collect_uploads(self, local_path, parent_id, pending):
+        """Walks local_path, creating Drive folders as needed and queueing files to upload or compare."""
+        existing_items = self._list_children(parent_id)
+
+        with os.scandir(local_path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    subfolder_id = self.get_or_create_folder(entry.name, parent_id)
+                    self._collect_uploads(entry.path, subfolder_id, pending)
+                    continue
+
+                existing = existing_items.get(entry.name)
+                if existing is not None and existing[2] is None:
+                    # Folders and Google-native files carry no checksum, so there is nothing to compare
+                    print(f"Skipping (exists): {entry.name}")
+                else:
+                    # Existing files are MD5-compared on the worker thread before any bytes are sent
+                    pending.append((entry.path, entry.name, parent_id, existing))
+
     def upload_recursive(self, local_path, parent_id):
-        query = f"'{parent_id}' in parents and trashed = false"
-        existing_items = {f['title']: f['id'] for f in self.drive.ListFile({'q': query}).GetList()}
+        pending = []
+        self._collect_uploads(local_path, parent_id, pending)
 
-        for item in os.listdir(local_path):
-            local_item_path = os.path.join(local_path, item)
-            
-            if os.path.isdir(local_item_path):
-                subfolder_id = self.get_or_create_folder(item, parent_id)
-                self.upload_recursive(local_item_path, subfolder_id)
-            else:
-                if item not in existing_items:
-                    print(f"Uploading: {item}")
-                    gfile = self.drive.CreateFile({'title': item, 'parents': [{'id': parent_id}]})
-                    gfile.SetContentFile(local_item_path)
-                    gfile.Upload()
-                else:
-                    print(f"Skipping (exists): {item}")
+        futures = [self._pool.submit(self._upload_one, *item) for item in pending]
+        for (_, title, item_parent_id, _), future in zip(pending, futures):
+            self._children_cache[item_parent_id][title] = future.result()
 
-def upload_to_gdrive():
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+def upload_to_gdrive(today_date=None):
+    """Syncs the ETL output folders to Drive.
+
+    today_date (YYYY-MM-DD, pulled from the transform task's XCom) only labels the run in the
+    logs: every root is synced in full so dates whose earlier upload failed are retried, and
+    the MD5 skip keeps already-uploaded files cheap.
+    """
     project_root = os.getenv('AIRFLOW_HOME', os.getcwd())
     
-    # Get today's date for features and plots
-    today_date = datetime.now().strftime("%Y-%m-%d")
-    
     # Define your folders using the IDs (not URLs) from your previous steps
     # Note: features_extracted and plots are stored in dated subdirectories
     TARGET_DRIVE_IDS = {
@@ -78,46 +234,18 @@ def upload_to_gdrive():
     }
 
     uploader = GDriveUploader()
+    if today_date:
+        print(f"--- Google Drive sync for run {today_date} ---")
     
-    for local_path, drive_id in TARGET_DRIVE_IDS.items():
-        if os.path.exists(local_path):
-            print(f"\n--- Syncing {local_path} ---")
-            uploader.upload_recursive(local_path, drive_id)
-        else:
-            print(f"\n⚠️  Skipping {local_path} (directory not found)")
+    try:
+        for local_path, drive_id in TARGET_DRIVE_IDS.items():
+            if os.path.exists(local_path):
+                print(f"\n--- Syncing {local_path} ---")
+                uploader.upload_recursive(local_path, drive_id)
+            else:
+                print(f"\n⚠️  Skipping {local_path} (directory not found)")
+    finally:
+        # Drain the upload pool even when an upload raised, so no worker threads outlive the task
+        uploader.close()
 
     print("\n--- Google Drive Sync Completed Successfully ---")
-
-
-
-# ==========================================
-# THE MANUAL SETUP BLOCK
-# ==========================================
-
-if __name__ == "__main__":
-    project_root = os.getcwd() 
-    secrets_path = os.path.join(project_root, 'client_secrets.json')
-    creds_path = os.path.join(project_root, 'mycreds.txt')
-
-    gauth = GoogleAuth()
-    
-    # 1. Set the client secrets path directly
-    gauth.settings['client_config_file'] = secrets_path
-    gauth.settings['client_config_backend'] = 'file'
-
-    # 2. Check for the file and run the handshake
-    if not os.path.exists(creds_path):
-        print(f"\n--- INITIAL SETUP: STARTING HANDSHAKE ---")
-        # BYPASS: Use LocalWebserverAuth if CommandLineAuth keeps looping on config
-        # If you are on your local machine, this is actually more reliable
-        try:
-            gauth.LocalWebserverAuth() 
-        except Exception:
-            # Fallback to Command Line if browser fails
-            gauth.CommandLineAuth()
-            
-        # 3. Save explicitly to the path
-        gauth.SaveCredentialsFile(creds_path)
-        print(f"\nSUCCESS: Credentials saved to {creds_path}")
-    else:
-        print(f"✅ Credentials already exist at {creds_path}.")
\ No newline at end of file
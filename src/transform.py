@@ -53,9 +53,17 @@ def transform_data():
     subject_mapping = initializer.get_group_mapping()
     active_dates = initializer.prepare_raw_data(START_DATE, END_DATE)
 
+    # Downstream tasks read this dict from XCom, so every exit path returns the same keys
+    result = {
+        'today_date': today_date,
+        'segmented_dir': SEGMENTED_DIR,
+        'features_csv': None,
+        'plots_dir': None
+    }
+
     if not active_dates:
         print("No data in this date range.")
-        return
+        return result
 
     # --- STEP 1: Avro to Organized CSV ---
     avro_proc = AvroProcessor(RAW_DIR, CSV_TEMP_DIR, ORGANIZED_DIR)
@@ -96,7 +104,7 @@ def transform_data():
     if not features_path:
         print("❌ Feature extraction failed. Skipping error plotting.")
         print("--- ETL PARTIAL (feature extraction failed) ---")
-        return SEGMENTED_DIR
+        return result
 
     # --- STEP 4: Error Plotting ---
     print(f"\nStarting Error Plotting (output dir: {PLOTS_DIR})...")
@@ -112,8 +120,6 @@ def transform_data():
     print(f"  - Features CSV: {features_path}")
     print(f"  - Error Plots: {PLOTS_DIR}")
     
-    return {
-        'segmented_dir': SEGMENTED_DIR,
-        'features_csv': features_path,
-        'plots_dir': plots_path
-    }
\ No newline at end of file
+    result['features_csv'] = features_path
+    result['plots_dir'] = plots_path
+    return result
\ No newline at end of file
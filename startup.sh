@@ -40,6 +40,10 @@ if [ ! -f "airflow.db" ]; then
         --password admin
 fi
 
+# 2b. Pools used by the ETL DAG (idempotent: 'set' creates or updates)
+airflow pools set cpu_pool 1 "CPU-bound transform tasks (parallelize internally)" >/dev/null
+airflow pools set drive_pool 1 "Rate-limited Google Drive uploads" >/dev/null
+
 # 3. Clean up old PID files (prevents "Airflow is already running" errors)
 find . -name "*.pid" -delete
 
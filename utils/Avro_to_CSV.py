@@ -1,11 +1,55 @@
+import errno
 import os
 import re
 import shutil
-import csv
-from avro.datafile import DataFileReader
-from avro.io import DatumReader
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from fastavro import reader as avro_reader
+
+_TARIS_RE = re.compile(r'TARIS\d+')
+
+def _decode_avro_worker(file_path):
+    """Decodes one Avro file into (signal, participant_id, timestamps, values) tuples; runs in a worker process."""
+    try:
+        with open(file_path, "rb") as f:
+            data = next(avro_reader(f))
+
+        # Use regex to get the ID (e.g., TARIS12) from 'TARIS12_1.avro' or 'TARIS12.avro'
+        base_file_name = os.path.basename(file_path)
+        match = _TARIS_RE.search(base_file_name)
+        participant_id = match.group() if match else base_file_name.split('_')[0].split('.')[0]
+
+        signals = []
+        for signal in ["eda", "bvp"]:
+            sig_data = data["rawData"][signal]
+            n = len(sig_data["values"])
+            # Sample i lands at timestampStart + i * period (microseconds), rounded to int
+            timestamps = np.rint(
+                sig_data["timestampStart"]
+                + np.arange(n, dtype=np.float64) * (1e6 / sig_data["samplingFrequency"])
+            ).astype(np.int64)
+            values = np.asarray(sig_data["values"], dtype=np.float32)
+            signals.append((signal, participant_id, timestamps, values))
+        return signals
+    except Exception as e:
+        print(f"Error processing {file_path}: {e}")
+        return []
+
+def _move(src, dst):
+    """os.replace (one rename syscall, overwrites dst); falls back to shutil.move across filesystems."""
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
 
 class AvroProcessor:
+    _taris_re = _TARIS_RE
+
     def __init__(self, raw_base_dir, output_csv_dir, organized_dir):
         self.raw_base_dir = raw_base_dir
         self.output_csv_dir = output_csv_dir
@@ -17,78 +61,74 @@ class AvroProcessor:
         if not os.path.exists(path):
             return
             
-        folders = [f for f in os.listdir(path) if os.path.isdir(os.path.join(path, f))]
+        with os.scandir(path) as it:
+            folders = [entry.name for entry in it if entry.is_dir(follow_symlinks=False)]
         for folder_name in folders:
             raw_data_path = os.path.join(path, folder_name, "raw_data", "v6")
             if not os.path.exists(raw_data_path):
                 continue
 
-            avro_files = [f for f in os.listdir(raw_data_path) if f.endswith('.avro')]
+            # Snapshot before renaming so renamed files are not picked up again
+            with os.scandir(raw_data_path) as it:
+                avro_files = [entry.path for entry in it if entry.name.endswith('.avro')]
             for i, avro_file in enumerate(avro_files, start=1):
                 new_name = f"{folder_name}_{i}.avro" if len(avro_files) > 1 else f"{folder_name}.avro"
-                os.rename(os.path.join(raw_data_path, avro_file), os.path.join(raw_data_path, new_name))
+                os.rename(avro_file, os.path.join(raw_data_path, new_name))
 
     def process_avro_to_csv(self):
         """Walks through raw data and extracts EDA/BVP signals to CSV."""
         os.makedirs(self.output_csv_dir, exist_ok=True)
-        
-        for root, _, files in os.walk(self.raw_base_dir):
-            for file in files:
-                if file.endswith(".avro"):
-                    self._convert_and_append_file(os.path.join(root, file))
-
-    def _convert_and_append_file(self, file_path):
-        """Extracts data and appends it to a single participant CSV."""
-        try:
-            with open(file_path, "rb") as f:
-                reader = DataFileReader(f, DatumReader())
-                data = next(reader)
-                
-                # Use regex to get the ID (e.g., TARIS12) from 'TARIS12_1.avro' or 'TARIS12.avro'
-                base_file_name = os.path.basename(file_path)
-                match = re.search(r'TARIS\d+', base_file_name)
-                participant_id = match.group() if match else base_file_name.split('_')[0].split('.')[0]
-
-                for signal in ["eda", "bvp"]:
-                    sig_data = data["rawData"][signal]
-                    timestamps = [
-                        round(sig_data["timestampStart"] + i * (1e6 / sig_data["samplingFrequency"]))
-                        for i in range(len(sig_data["values"]))
-                    ]
-                    
-                    # File naming: e.g., eda_TARIS12.csv (regardless of which chunk this is)
-                    out_file = os.path.join(self.output_csv_dir, f"{signal}_{participant_id}.csv")
-                    
-                    # 'a' mode appends. If it's the first time, write the header.
-                    file_exists = os.path.isfile(out_file)
-                    with open(out_file, 'a', newline='') as f_out:
-                        writer = csv.writer(f_out)
-                        if not file_exists:
-                            writer.writerow(["unix_timestamp", signal])
-                        writer.writerows(zip(timestamps, sig_data["values"]))
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
 
-    def organize_by_subject(self, mapping):
-        """Moves CSVs into TARIS folders and then into Activity groups."""
-        # Step 1: Segregate by TARIS ID
-        for file_name in os.listdir(self.output_csv_dir):
-            match = re.search(r'TARIS\d+', file_name)
-            if match:
-                taris_id = match.group()
-                dest_dir = os.path.join(self.organized_dir, taris_id)
-                os.makedirs(dest_dir, exist_ok=True)
-                shutil.move(os.path.join(self.output_csv_dir, file_name), os.path.join(dest_dir, file_name))
+        avro_paths = [os.path.join(root, file)
+                      for root, _, files in os.walk(self.raw_base_dir)
+                      for file in files if file.endswith(".avro")]
+
+        # Decoding is CPU-bound and independent per file; map() keeps the walk order
+        # (signal, participant_id) -> record batches, written out once after decoding
+        buffers = defaultdict(list)
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+            for signals in ex.map(_decode_avro_worker, avro_paths, chunksize=8):
+                for signal, participant_id, timestamps, values in signals:
+                    buffers[(signal, participant_id)].append(
+                        pa.record_batch([pa.array(timestamps), pa.array(values)],
+                                        names=["unix_timestamp", signal])
+                    )
 
-        # Step 2: Group by Activity
+        self._write_buffers(buffers)
+
+    def _write_buffers(self, buffers):
+        """Writes one CSV per (signal, participant), chunks in the order they were read."""
+        for (signal, participant_id), batches in buffers.items():
+            # File naming: e.g., eda_TARIS12.csv (regardless of how many chunks it came from)
+            out_file = os.path.join(self.output_csv_dir, f"{signal}_{participant_id}.csv")
+            pacsv.write_csv(pa.Table.from_batches(batches), out_file)
+
+    def organize_by_subject(self, mapping):
+        """Moves each CSV straight into its Activity group's TARIS folder in a single pass."""
+        subject_to_group = {}
         for group, subjects in mapping.items():
-            group_path = os.path.join(self.organized_dir, group)
-            os.makedirs(group_path, exist_ok=True)
+            os.makedirs(os.path.join(self.organized_dir, group), exist_ok=True)
             for subject in subjects:
-                subject_current_path = os.path.join(self.organized_dir, subject)
-                if os.path.exists(subject_current_path):
-                    dest_path = os.path.join(group_path, subject)
-                    # Remove if already exists and then move
-                    if os.path.exists(dest_path):
-                        shutil.rmtree(dest_path)
-                    shutil.move(subject_current_path, dest_path)
\ No newline at end of file
+                subject_to_group.setdefault(subject, group)
+
+        # Snapshot the listing since files are moved out of the directory as we go
+        with os.scandir(self.output_csv_dir) as it:
+            entries = [entry for entry in it if entry.is_file()]
+
+        prepared = set()
+        for entry in entries:
+            match = self._taris_re.search(entry.name)
+            if not match:
+                continue
+            taris_id = match.group()
+            group = subject_to_group.get(taris_id)
+            # Subjects missing from the mapping stay directly under organized_dir, as before
+            dest_dir = os.path.join(self.organized_dir, group, taris_id) if group else os.path.join(self.organized_dir, taris_id)
+
+            if dest_dir not in prepared:
+                # Replace a grouped subject folder left over from a previous run
+                if group and os.path.exists(dest_dir):
+                    shutil.rmtree(dest_dir)
+                os.makedirs(dest_dir, exist_ok=True)
+                prepared.add(dest_dir)
+            _move(entry.path, os.path.join(dest_dir, entry.name))
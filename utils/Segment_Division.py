@@ -1,4 +1,5 @@
-import pandas as pd
+import mmap
+import numpy as np
 import os
 
 class CSVSegmenter:
@@ -14,26 +15,44 @@ class CSVSegmenter:
             raise ValueError(f"Ratios ({len(self.ratios)}) and Extensions ({len(self.extensions)}) must match.")
 
         try:
-            df = pd.read_csv(file_path)
-            total_rows = len(df)
-            if total_rows == 0:
+            if os.path.getsize(file_path) == 0:
                 return
 
-            # Calculate slice sizes
-            total_weight = sum(self.ratios)
-            target_sizes = [(total_rows * r) // total_weight for r in self.ratios]
-            target_sizes[-1] = total_rows - sum(target_sizes[:-1]) # Adjust for rounding
-
-            # Slice and Save
-            base_name = os.path.splitext(os.path.basename(file_path))[0]
-            start = 0
-            for size, ext in zip(target_sizes, self.extensions):
-                end = start + size
-                chunk = df[start:end]
-                
-                output_file = os.path.join(current_output_dir, f"{base_name}_{ext}.csv")
-                chunk.to_csv(output_file, index=False)
-                start = end
+            with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                # Offsets of every '\n' in one vectorized pass; the first one ends the header
+                newlines = np.flatnonzero(np.frombuffer(buf, dtype=np.uint8) == 0x0A)
+                if len(newlines) == 0:
+                    return
+                header_end = int(newlines[0]) + 1
+                # row_ends[i] is the byte offset just past data row i (last row may lack a '\n')
+                row_ends = newlines[1:] + 1
+                if header_end < len(buf) and (len(row_ends) == 0 or row_ends[-1] < len(buf)):
+                    row_ends = np.append(row_ends, len(buf))
+                total_rows = len(row_ends)
+                if total_rows == 0:
+                    return
+
+                # Calculate slice sizes
+                total_weight = sum(self.ratios)
+                target_sizes = [(total_rows * r) // total_weight for r in self.ratios]
+                target_sizes[-1] = total_rows - sum(target_sizes[:-1]) # Adjust for rounding
+
+                # Slice and Save: copy contiguous byte ranges, repeating the header in each chunk
+                header = buf[:header_end]
+                base_name = os.path.splitext(os.path.basename(file_path))[0]
+                start = 0
+                for size, ext in zip(target_sizes, self.extensions):
+                    end = start + size
+                    start_off = header_end if start == 0 else int(row_ends[start - 1])
+                    end_off = int(row_ends[end - 1]) if end > 0 else start_off
+                    chunk = buf[start_off:end_off]
+                    if chunk and not chunk.endswith(b'\n'):
+                        chunk += b'\n'
+
+                    output_file = os.path.join(current_output_dir, f"{base_name}_{ext}.csv")
+                    with open(output_file, 'wb') as out:
+                        out.write(header + chunk)
+                    start = end
                 
         except Exception as e:
             print(f"Error splitting {file_path}: {e}")
@@ -0,0 +1,62 @@
+"""
+Numba-compiled kernels for the feature extraction hot paths.
+Importing this module requires numba; callers fall back to NumPy when it is missing.
+"""
+import math
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def hrv_stats(rri):
+    """HRV statistics of an R-R interval series (seconds) in one fused pass, no temporaries.
+
+    Returns (mean R-R, SDNN, RMSSD, HR, pNN50, Poincare SD1, Poincare SD2), matching
+    the NumPy implementation in extract_bvp_features (sample std, ddof=1).
+    """
+    n = rri.shape[0]
+    m = n - 1  # number of successive differences
+
+    total = 0.0
+    for i in range(n):
+        total += rri[i]
+    mean_rri = total / n
+
+    ss = 0.0
+    for i in range(n):
+        d = rri[i] - mean_rri
+        ss += d * d
+    sdnn = math.sqrt(ss / (n - 1)) if n > 1 else np.nan
+
+    sum_diff = 0.0
+    sum_diff_sq = 0.0
+    sum_pair = 0.0
+    nn50 = 0
+    for i in range(m):
+        d = rri[i + 1] - rri[i]
+        sum_diff += d
+        sum_diff_sq += d * d
+        sum_pair += rri[i + 1] + rri[i]
+        if abs(d) > 0.05:
+            nn50 += 1
+    rmssd = math.sqrt(sum_diff_sq / m) if m > 0 else np.nan
+    pnn50 = nn50 / m * 100 if m > 0 else np.nan
+
+    # Poincare axes: std of (rri[i] -/+ rri[i+1]) / sqrt(2)
+    sd1 = np.nan
+    sd2 = np.nan
+    if m > 1:
+        mean_diff = sum_diff / m
+        mean_pair = sum_pair / m
+        var_diff = 0.0
+        var_pair = 0.0
+        for i in range(m):
+            d = rri[i + 1] - rri[i] - mean_diff
+            p = rri[i + 1] + rri[i] - mean_pair
+            var_diff += d * d
+            var_pair += p * p
+        sd1 = math.sqrt(var_diff / (m - 1)) / math.sqrt(2.0)
+        sd2 = math.sqrt(var_pair / (m - 1)) / math.sqrt(2.0)
+
+    hr = 60.0 / mean_rri
+    return mean_rri, sdnn, rmssd, hr, pnn50, sd1, sd2
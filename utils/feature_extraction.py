@@ -3,6 +3,8 @@ EDA and BVP feature extraction from phase-segmented CSV files.
 Reads from the pipeline's phase_segmented output and writes to etl/features_extracted.
 """
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 import warnings
@@ -11,14 +13,28 @@ warnings.filterwarnings("ignore", category=RuntimeWarning)
 
 import neurokit2 as nk
 
+try:
+    from utils._kernels import hrv_stats
+except ImportError:  # numba not installed: use the NumPy implementation below
+    hrv_stats = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # pyarrow not installed: read with pandas' C parser instead
+    pacsv = None
+
 # Define EDA and BVP features
 eda_features = ['scl_mean', 'scl_std', 'phasic_mean', 'scr_count', 'scr_amp_mean', 'signal_quality']
 bvp_features = ['R-R_Intervals', 'SDNN', 'RMSSD', 'HR', 'pNN50', 'Poincare_SD1', 'Poincare_SD2']
 
 features = eda_features + bvp_features
 cols = ['SubjectID'] + features + ['Phase', 'Intervention']
-eda_features_length = len(eda_features) + 1
-bvp_features_length = len(bvp_features) + eda_features_length
+
+# Filename prefixes of the per-phase signal CSVs written by the segmentation step
+_PREFIXES = ('eda_', 'bvp_')
+# Phase suffix appended by the segmentation step, e.g. eda_baseline.csv
+_PHASE_RE = re.compile(r'_(baseline|intervention|test|rest)')
 
 
 def get_paths():
@@ -43,8 +59,8 @@ def extract_eda_features(eda_signal: np.ndarray, sampling_rate: int = 64):
     if len(eda_signal) <= 15:
         return [np.nan] * 6
     try:
-        eda_normalized = (eda_signal - np.mean(eda_signal)) / np.std(eda_signal)
-        signals, info = nk.eda_process(eda_normalized, sampling_rate=sampling_rate)
+        # Raw microsiemens go straight in: the SCL/SCR decomposition expects the physiological scale
+        signals, info = nk.eda_process(eda_signal, sampling_rate=sampling_rate)
         eda_tonic = signals["EDA_Tonic"]
         eda_phasic = signals["EDA_Phasic"]
         scr_amps = info["SCR_Amplitude"]
@@ -55,7 +71,7 @@ def extract_eda_features(eda_signal: np.ndarray, sampling_rate: int = 64):
             'phasic_mean': np.mean(eda_phasic),
             'scr_count': scr_count,
             'scr_amp_mean': np.mean(scr_amps) if scr_count > 0 else 0,
-            'signal_quality': np.var(eda_normalized),
+            'signal_quality': float(np.var(eda_signal, dtype=np.float64)),
         }
         return list(eda_features_dict.values())
     except Exception as e:
@@ -81,18 +97,21 @@ def extract_bvp_features(bvp_signal: np.ndarray, sampling_rate: int = 64):
         rri = np.diff(peaks) / sampling_rate
         if len(rri) < 2:
             return [np.nan] * 7
-        sdnn = np.nanstd(rri, ddof=1)
-        rmssd = np.sqrt(np.mean(np.diff(rri) ** 2))
-        hr = 60 / np.mean(rri)
-        diff_rri = np.abs(np.diff(rri))
-        pnn50 = np.sum(diff_rri > 0.05) / len(diff_rri) * 100
-        rri_n = rri[:-1]
-        rri_plus = rri[1:]
-        sd1 = np.std((rri_n - rri_plus) / np.sqrt(2), ddof=1)
-        sd2 = np.std((rri_n + rri_plus) / np.sqrt(2), ddof=1)
+        if hrv_stats is not None:
+            return [float(v) for v in hrv_stats(np.ascontiguousarray(rri, dtype=np.float64))]
+        # NumPy fallback: one diff array reused by every successive-difference statistic
+        d = np.diff(rri)
+        mean_rri = rri.mean()
+        sdnn = rri.std(ddof=1)
+        rmssd = np.sqrt(np.dot(d, d) / len(d))
+        hr = 60 / mean_rri
+        pnn50 = np.count_nonzero(np.abs(d) > 0.05) / len(d) * 100
+        # Poincare axes: std(x / sqrt(2)) == std(x) / sqrt(2), and rri_n - rri_plus == -d
+        sd1 = d.std(ddof=1) / np.sqrt(2)
+        sd2 = (rri[:-1] + rri[1:]).std(ddof=1) / np.sqrt(2)
         # Store scalar for R-R (mean) so DataFrame row is valid
         bvp_features_list = [
-            np.mean(rri),
+            mean_rri,
             sdnn,
             rmssd,
             hr,
@@ -105,56 +124,73 @@ def extract_bvp_features(bvp_signal: np.ndarray, sampling_rate: int = 64):
         raise RuntimeError(f"BVP processing error: {str(e)}")
 
 
-def extract_features(folder_path, subject_id, control_subjects, breathing_subjects, raga_subjects, features_df):
-    if subject_id in control_subjects:
-        intervention = 'Control'
-    elif subject_id in breathing_subjects:
-        intervention = 'Breathing'
-    elif subject_id in raga_subjects:
-        intervention = 'Raga'
-    else:
-        intervention = 'Unknown'
+def read_signal(file_path, signal):
+    """Reads the single `signal` column ('eda' or 'bvp') of a phase CSV as a float32 array."""
+    if pacsv is not None:
+        table = pacsv.read_csv(file_path, convert_options=pacsv.ConvertOptions(
+            include_columns=[signal], column_types={signal: pa.float32()}))
+        return table.column(signal).to_numpy()
+    return pd.read_csv(file_path, usecols=[signal], dtype=np.float32)[signal].to_numpy()
+
+
+def extract_features(folder_path, subject_id, subject_to_intervention):
+    """Returns one feature row (a dict keyed by `cols`) per phase found in a subject's folder."""
+    intervention = subject_to_intervention.get(subject_id, 'Unknown')
 
     print("Processing : " + subject_id)
     
     # Group files by condition
     conditions_data = {}
-    for filename in os.listdir(folder_path):
-        if filename.endswith('.csv') and (filename.startswith('eda_') or filename.startswith('bvp_')):
-            file_path = os.path.join(folder_path, filename)
-            condition = None
-            if 'baseline' in filename:
-                condition = 'baseline'
-            elif 'intervention' in filename:
-                condition = 'intervention'
-            elif 'test' in filename:
-                condition = 'test'
-            elif 'rest' in filename:
-                condition = 'rest'
-
-            if condition is not None:
-                if condition not in conditions_data:
-                    conditions_data[condition] = {'eda': None, 'bvp': None}
-                
-                df = pd.read_csv(file_path)
-                if filename.startswith('eda_'):
-                    conditions_data[condition]['eda'] = df['eda'].values
-                elif filename.startswith('bvp_'):
-                    conditions_data[condition]['bvp'] = df['bvp'].values
+    with os.scandir(folder_path) as it:
+        entries = [e for e in it if e.is_file() and e.name.endswith('.csv') and e.name.startswith(_PREFIXES)]
+    for entry in entries:
+        filename = entry.name
+        file_path = entry.path
+        match = _PHASE_RE.search(filename)
+        if match is None:
+            continue
+        condition = match.group(1)
+        if condition not in conditions_data:
+            conditions_data[condition] = {'eda': None, 'bvp': None}
+
+        # Parse only the one signal column this file contributes
+        signal = 'eda' if filename.startswith('eda_') else 'bvp'
+        conditions_data[condition][signal] = read_signal(file_path, signal)
     
     # Create one row per condition with both EDA and BVP features
+    rows = []
     for condition, signals in conditions_data.items():
-        row = [subject_id] + [np.nan] * len(features) + [condition] + [intervention]
+        # Features for a missing signal are left out and become NaN in the final DataFrame
+        row = {'SubjectID': subject_id, 'Phase': condition, 'Intervention': intervention}
         
-        if signals['eda'] is not None:
-            eda_features_values = extract_eda_features(signals['eda'])
-            row[1:eda_features_length] = eda_features_values
-        
-        if signals['bvp'] is not None:
-            bvp_features_values = extract_bvp_features(signals['bvp'])
-            row[eda_features_length:bvp_features_length] = bvp_features_values
+        # A bad segment costs only its own row; phases already extracted are still returned
+        try:
+            if signals['eda'] is not None:
+                row.update(zip(eda_features, extract_eda_features(signals['eda'])))
+            
+            if signals['bvp'] is not None:
+                row.update(zip(bvp_features, extract_bvp_features(signals['bvp'])))
+        except Exception as e:
+            print(f"Error processing subject {subject_id}, phase {condition}: {e}")
+            continue
         
-        features_df.loc[len(features_df)] = row.copy()
+        rows.append(row)
+
+    return rows
+
+
+def _extract_subject_worker(task):
+    """Runs extract_features for one subject in a worker process; errors are logged, not raised.
+
+    Per-phase failures are handled inside extract_features; this only catches what escapes it
+    (e.g. an unreadable CSV), which drops the subject.
+    """
+    subject_id = task[1]
+    try:
+        return extract_features(*task)
+    except Exception as e:
+        print(f"Error processing subject {subject_id}: {e}")
+        return []
 
 
 def run_feature_extraction(root_dir=None, output_path=None):
@@ -178,8 +214,12 @@ def run_feature_extraction(root_dir=None, output_path=None):
     print(f"Detected Breathing Subjects: {breathing_subjects}")
     print(f"Detected Raga Subjects: {raga_subjects}")
 
-    features_df = pd.DataFrame(columns=cols)
+    # Later groups win for a subject listed twice, matching the old Control/Breathing/Raga if-chain
+    subject_to_intervention = {s: 'Raga' for s in raga_subjects}
+    subject_to_intervention.update({s: 'Breathing' for s in breathing_subjects})
+    subject_to_intervention.update({s: 'Control' for s in control_subjects})
 
+    tasks = []
     for parent_dir in [control_path, breathing_path, raga_path]:
         if not os.path.exists(parent_dir):
             print(f"Skipping missing path: {parent_dir}")
@@ -187,14 +227,15 @@ def run_feature_extraction(root_dir=None, output_path=None):
         for folder in os.listdir(parent_dir):
             folder_path = os.path.join(parent_dir, folder)
             if os.path.isdir(folder_path):
-                try:
-                    extract_features(
-                        folder_path, folder,
-                        control_subjects, breathing_subjects, raga_subjects,
-                        features_df
-                    )
-                except Exception as e:
-                    print(f"Error processing subject {folder}: {e}")
+                tasks.append((folder_path, folder, subject_to_intervention))
+
+    # Subjects are independent and the signal processing is CPU-bound, so spread them over processes
+    rows = []
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        for subject_rows in ex.map(_extract_subject_worker, tasks):
+            rows.extend(subject_rows)
+
+    features_df = pd.DataFrame(rows, columns=cols)
 
     if features_df.empty:
         print("No features extracted.")
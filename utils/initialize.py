@@ -1,59 +1,91 @@
 import os
 import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from datetime import datetime
 
+LINK_MODES = ('hardlink', 'reflink', 'copy')
+# Folder copies are I/O-bound (the GIL is released in the os calls), so threads overlap them
+COPY_WORKERS = 16
+
+
+def _link_or_copy_tree(src, dst, link_mode):
+    """copytree that shares data blocks with src where the filesystem allows it.
+
+    'hardlink' links every file (same filesystem only), 'reflink' asks cp for CoW clones
+    (btrfs/XFS), 'copy' always copies bytes. Any failure falls back to a plain copy.
+    Later pipeline steps only rename/move files in dst, never rewrite them, so the
+    source files are never modified through a link.
+    """
+    if link_mode == 'hardlink':
+        try:
+            shutil.copytree(src, dst, copy_function=os.link)
+            return
+        except OSError:  # EXDEV across devices, or links unsupported
+            shutil.rmtree(dst, ignore_errors=True)
+    elif link_mode == 'reflink':
+        result = subprocess.run(['cp', '-r', '--reflink=auto', src, dst], capture_output=True)
+        if result.returncode == 0:
+            return
+        shutil.rmtree(dst, ignore_errors=True)
+    shutil.copytree(src, dst)
+
+
 class ETLInitializer:
-    def __init__(self, metadata_path, unprocessed_base_dir, raw_output_dir):
+    def __init__(self, metadata_path, unprocessed_base_dir, raw_output_dir, link_mode='hardlink'):
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"link_mode must be one of {LINK_MODES}, got {link_mode!r}")
         self.metadata_path = metadata_path
         self.unprocessed_base_dir = unprocessed_base_dir
         self.raw_output_dir = raw_output_dir
+        self.link_mode = link_mode
         
         # Load and clean headers immediately
         df = pd.read_csv(metadata_path)
         df.columns = df.columns.str.strip() # Remove any hidden spaces
+        # Derived columns are parsed once for the whole sheet instead of per row
+        # FIX: Explicitly handle the DD.MM.YYYY format found in your CSV
+        df['Date'] = pd.to_datetime(df['Date'], format='%d.%m.%Y', errors='coerce', cache=True).dt.date
+        # ID from first column, e.g., '1' -> '01'
+        df['part_suffix'] = df['Participant ID'].astype(str).str.strip().str.zfill(2)
+        # ID from hardware column, e.g., 'TARIS05'
+        df['emp_id'] = df['Empatica ID'].astype(str).str.strip()
         self._metadata_df = df
 
     def get_group_mapping(self):
         """Dynamically maps Participant ID to Group."""
-        mapping = {}
-        for _, row in self._metadata_df.iterrows():
-            group = str(row['Group']).strip()
-            # User requirement: rename as 'TARIS<(Participant ID)>'
-            part_id = f"TARIS{str(row['Participant ID']).strip().zfill(2)}"
-            
-            if group not in mapping:
-                mapping[group] = []
-            if part_id not in mapping[group]:
-                mapping[group].append(part_id)
-        return mapping
+        df = self._metadata_df
+        # User requirement: rename as 'TARIS<(Participant ID)>'
+        pairs = pd.DataFrame({
+            'group': df['Group'].astype(str).str.strip(),
+            'part_id': 'TARIS' + df['part_suffix'],
+        }).drop_duplicates()
+        # sort=False keeps groups and IDs in the order they first appear in the sheet
+        return {group: ids.tolist() for group, ids in pairs.groupby('group', sort=False)['part_id']}
 
     def prepare_raw_data(self, start_date_str, end_date_str):
         """Locates Empatica folders and renames them to TARIS<ID>."""
-        df = self._metadata_df.copy()
-        
-        # FIX: Explicitly handle the DD.MM.YYYY format found in your CSV
-        df['Date'] = pd.to_datetime(df['Date'], format='%d.%m.%Y', errors='coerce').dt.date
+        df = self._metadata_df
         
         # Filter range
         start = datetime.strptime(start_date_str, "%Y-%m-%d").date()
         end = datetime.strptime(end_date_str, "%Y-%m-%d").date()
         
-        active_participants = df[(df['Date'] >= start) & (df['Date'] <= end)].copy()
+        mask = (df['Date'] >= start) & (df['Date'] <= end)
+        active_participants = df.loc[mask, ['part_suffix', 'emp_id', 'Date']]
 
         if active_participants.empty:
             print(f"No records found between {start_date_str} and {end_date_str}")
             return []
 
-        processed_dates = []
+        # Keyed by dest_path: when several source folders match one participant, the last one wins
+        # (as in the old sequential loop) and no two threads ever touch the same destination tree
+        copies = {}
 
-        for _, row in active_participants.iterrows():
-            # ID from first column, e.g., '1' -> '01'
-            part_suffix = str(row['Participant ID']).strip().zfill(2)
-            # ID from hardware column, e.g., 'TARIS05'
-            emp_id = str(row['Empatica ID']).strip()
+        for part_suffix, emp_id, date in active_participants.itertuples(index=False):
             # Date in YYYY-MM-DD for folder structure
-            date_folder = row['Date'].strftime("%Y-%m-%d")
+            date_folder = date.strftime("%Y-%m-%d")
             
             source_dir = os.path.join(self.unprocessed_base_dir, date_folder)
             
@@ -62,24 +94,35 @@ class ETLInitializer:
 
             # Find the folder starting with Empatica ID (e.g., 'TARIS05')
             try:
-                found_folders = [f for f in os.listdir(source_dir) 
-                                if f.startswith(emp_id) and os.path.isdir(os.path.join(source_dir, f))]
-                
-                for folder in found_folders:
-                    # Map (Empatica_ID, Date) to Participant_ID and rename folder
-                    # Safe because date folder structure prevents collisions
-                    dest_name = f"TARIS{part_suffix}"
-                    dest_path = os.path.join(self.raw_output_dir, date_folder, dest_name)
-                    
-                    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-                    
-                    if os.path.exists(dest_path):
-                        shutil.rmtree(dest_path)
-                    
-                    shutil.copytree(os.path.join(source_dir, folder), dest_path)
-                    print(f"✅ Initialized: {folder} -> {date_folder}/{dest_name}")
-                    processed_dates.append(date_folder)
-            except Exception as e:
+                with os.scandir(source_dir) as it:
+                    found_folders = [entry.name for entry in it
+                                     if entry.name.startswith(emp_id) and entry.is_dir(follow_symlinks=False)]
+            except OSError as e:
                 print(f"❌ Error moving {emp_id}: {e}")
+                continue
+
+            for folder in found_folders:
+                # Map (Empatica_ID, Date) to Participant_ID and rename folder
+                # Safe because date folder structure prevents collisions
+                dest_name = f"TARIS{part_suffix}"
+                dest_path = os.path.join(self.raw_output_dir, date_folder, dest_name)
+                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                copies[dest_path] = (os.path.join(source_dir, folder), dest_path, emp_id, date_folder,
+                                     f"{folder} -> {date_folder}/{dest_name}")
+
+        with ThreadPoolExecutor(max_workers=COPY_WORKERS) as ex:
+            processed_dates = {d for d in ex.map(lambda c: self._safe_copy(*c), copies.values()) if d is not None}
+
+        return list(processed_dates)
 
-        return list(set(processed_dates))
\ No newline at end of file
+    def _safe_copy(self, src_dir, dest_path, emp_id, date_folder, label):
+        """Replaces dest_path with src_dir's contents; returns date_folder, or None on failure."""
+        try:
+            if os.path.exists(dest_path):
+                shutil.rmtree(dest_path)
+            _link_or_copy_tree(src_dir, dest_path, self.link_mode)
+            print(f"✅ Initialized: {label}")
+            return date_folder
+        except Exception as e:
+            print(f"❌ Error moving {emp_id}: {e}")
+            return None